@@ -2,6 +2,7 @@
 """Точка входа в приложение валютного кошелька."""
 
 from valutatrade_hub.cli.interface import CLI
+from valutatrade_hub.infra.database import db
 from valutatrade_hub.parser_service.scheduler import Scheduler
 
 
@@ -9,14 +10,19 @@ def main():
     """Запуск CLI интерфейса."""
     cli = CLI()
 
-    # Запуск фонового обновления курсов каждые 5 минут
-    scheduler = Scheduler(interval_seconds=300)
+    # Запуск фонового обновления курсов каждые 5 минут. Поток-демон не держит
+    # процесс, если текущее обновление не уложилось в таймаут остановки.
+    scheduler = Scheduler(interval_seconds=300, daemon=True)
     scheduler.start()
 
     try:
         cli.run()
     finally:
+        # Остановка с ограниченным ожиданием (join с таймаутом), чтобы не оборвать
+        # запись в историю курсов и не сворачивать журнал во время обновления
         scheduler.stop()
+        # Журнал сделок сворачивается в portfolios.json при выходе
+        db.compact_portfolios()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 """Консольный интерфейс приложения с обработкой ошибок."""
 
+import re
 import shlex
-
-from prettytable import PrettyTable
+import sys
 
 from valutatrade_hub.core.exceptions import (
     ApiRequestError,
@@ -14,10 +14,63 @@ from valutatrade_hub.core.exceptions import (
     WalletNotFoundError,
 )
 from valutatrade_hub.core.usecases import UseCases
-from valutatrade_hub.infra.database import db
-from valutatrade_hub.logging_config import setup_logging
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+from valutatrade_hub.logging_config import action_logger, setup_logging
+
+# Пары с крупными курсами показываются с разделителями разрядов
+_CRYPTO_PREFIXES = frozenset({"BTC", "ETH", "SOL"})
+_CRYPTO_RATE_FORMAT = ",.2f"
+_FIAT_RATE_FORMAT = ".4f"
+
+_SHELL_QUOTE_CHARS = ("\"", "'", "\\")
+
+# Числовой литерал для --amount; знак допускается, чтобы отрицательные суммы
+# отклонялись валидацией бизнес-логики с понятным сообщением
+_AMOUNT_RE = re.compile(r"^[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?$")
+
+_HELP_TEXT = """
+Доступные команды:
+  register --username <имя> --password <пароль>  - Регистрация нового пользователя
+  login --username <имя> --password <пароль>     - Вход в систему
+  logout                                        - Выход из системы
+  show-portfolio [--base <валюта>]              - Показать портфель (по умолчанию USD)
+  buy --currency <код> --amount <сумма>         - Покупка валюты
+  sell --currency <код> --amount <сумма>        - Продажа валюты
+  get-rate --from <валюта> --to <валюта>        - Текущий курс обмена
+  exit                                          - Выход из приложения
+
+Поддерживаемые валюты: USD, EUR, RUB, GBP, JPY, BTC, ETH, SOL, XRP
+
+"""
+
+_RATES_TABLE_HEADER = ("Пара", "Курс", "Обновлено", "Источник")
+_RATES_TABLE_ALIGN = ("<", ">", "<", "<")
+
+
+def _short_timestamp(value: str) -> str:
+    """ISO-время без долей секунды и с пробелом вместо 'T'."""
+    dot = value.find(".")
+    if dot >= 0:
+        value = value[:dot]
+    return value.replace("T", " ", 1)
+
+
+def _format_table(header: tuple, align: tuple, rows: list) -> str:
+    """Форматирование таблицы с рамкой из уже отформатированных строковых ячеек."""
+    widths = [len(h) for h in header]
+    for row in rows:
+        for i, cell in enumerate(row):
+            if len(cell) > widths[i]:
+                widths[i] = len(cell)
+
+    border = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+    head = "| " + " | ".join(f"{h:^{w}}" for h, w in zip(header, widths)) + " |"
+    lines = [border, head, border]
+    lines.extend(
+        "| " + " | ".join(f"{c:{a}{w}}" for c, a, w in zip(row, align, widths)) + " |"
+        for row in rows
+    )
+    lines.append(border)
+    return "\n".join(lines)
 
 
 class CLI:
@@ -26,27 +79,44 @@ class CLI:
     def __init__(self):
         setup_logging()
         self.use_cases = UseCases()
-        self._init_data_files()
-
-    def _init_data_files(self):
-        _ = db.get_exchange_rates()
+        self._dispatch = {
+            "register": self._cmd_register,
+            "login": self._cmd_login,
+            "logout": self._cmd_logout,
+            "show-portfolio": self._cmd_show_portfolio,
+            "buy": self._cmd_buy,
+            "sell": self._cmd_sell,
+            "get-rate": self._cmd_get_rate,
+            "update-rates": self._cmd_update_rates,
+            "show-rates": self._cmd_show_rates,
+        }
 
     def run(self):
         """Основной цикл CLI."""
         print("Добро пожаловать в ValutaTrade Hub! (v0.2.0)")
         print("Введите 'help' для списка команд или 'exit' для выхода.\n")
 
+        # В терминале строки читаются через input() с приглашением,
+        # при перенаправленном вводе (скрипт, pipe) — напрямую из stdin
+        lines = None if sys.stdin.isatty() else self._read_lines()
         while True:
             try:
-                cmd_input = input("valutatrade> ").strip()
-                if not cmd_input:
+                if lines is None:
+                    raw = input("valutatrade> ")
+                else:
+                    raw = next(lines, None)
+                    if raw is None:
+                        raise EOFError
+                if not raw or raw.isspace():
                     continue
+                cmd_input = raw.strip()
 
-                if cmd_input.lower() in ("exit", "quit"):
+                lowered = cmd_input.lower()
+                if lowered in ("exit", "quit"):
                     print("До свидания!")
                     break
 
-                if cmd_input.lower() == "help":
+                if lowered == "help":
                     self._show_help()
                     continue
 
@@ -61,51 +131,53 @@ class CLI:
             except Exception as e:
                 # Обработка неожиданных ошибок
                 print(f"❌ Критическая ошибка: {type(e).__name__}: {e}")
-                import logging
+                action_logger.exception("Unhandled exception in CLI")
 
-                logging.getLogger("actions").exception("Unhandled exception in CLI")
+    def _read_lines(self):
+        """Строки команд из перенаправленного stdin.
+
+        Байты декодируются построчно с заменой недопустимых символов,
+        поэтому одна испорченная строка не прерывает чтение остальных.
+        """
+        buffer = getattr(sys.stdin, "buffer", None)
+        if buffer is None:
+            yield from sys.stdin
+            return
+        encoding = sys.stdin.encoding or "utf-8"
+        for line in buffer:
+            yield line.decode(encoding, errors="replace")
 
     def _show_help(self):
         """Вывод справки по командам."""
-        help_text = """
-Доступные команды:
-  register --username <имя> --password <пароль>  - Регистрация нового пользователя
-  login --username <имя> --password <пароль>     - Вход в систему
-  logout                                        - Выход из системы
-  show-portfolio [--base <валюта>]              - Показать портфель (по умолчанию USD)
-  buy --currency <код> --amount <сумма>         - Покупка валюты
-  sell --currency <код> --amount <сумма>        - Продажа валюты
-  get-rate --from <валюта> --to <валюта>        - Текущий курс обмена
-  exit                                          - Выход из приложения
-
-Поддерживаемые валюты: USD, EUR, RUB, GBP, JPY, BTC, ETH, SOL, XRP
-        """
-        print(help_text)
+        sys.stdout.write(_HELP_TEXT)
 
     def _parse_args(self, arg_list: list) -> dict:
         """Парсинг аргументов вида --key value."""
         args = {}
+        n = len(arg_list)
         i = 0
-        while i < len(arg_list):
-            if arg_list[i].startswith("--"):
-                key = arg_list[i][2:]
-                if i + 1 < len(arg_list) and not arg_list[i + 1].startswith("--"):
-                    args[key] = arg_list[i + 1]
+        while i < n:
+            token = arg_list[i]
+            if token[:2] == "--":
+                if i + 1 < n and arg_list[i + 1][:2] != "--":
+                    args[token[2:]] = arg_list[i + 1]
                     i += 2
-                else:
-                    args[key] = True
-                    i += 1
-            else:
-                i += 1
+                    continue
+                args[token[2:]] = True
+            i += 1
         return args
 
     def _process_command(self, cmd_input: str):
         """Парсинг и выполнение команды."""
-        try:
-            parts = shlex.split(cmd_input)
-        except ValueError as e:
-            print(f"❌ Ошибка парсинга команды: {e}")
-            return
+        # shlex нужен только для кавычек и экранирования, иначе хватает str.split
+        if any(c in cmd_input for c in _SHELL_QUOTE_CHARS):
+            try:
+                parts = shlex.split(cmd_input)
+            except ValueError as e:
+                print(f"❌ Ошибка парсинга команды: {e}")
+                return
+        else:
+            parts = cmd_input.split()
 
         if not parts:
             return
@@ -113,28 +185,13 @@ class CLI:
         command = parts[0].lower()
         args = self._parse_args(parts[1:])
 
-        # Диспетчеризация команд
+        handler = self._dispatch.get(command)
+        if handler is None:
+            print(f"❌ Неизвестная команда: {command}. Введите 'help' для справки.")
+            return
+
         try:
-            if command == "register":
-                self._cmd_register(args)
-            elif command == "login":
-                self._cmd_login(args)
-            elif command == "logout":
-                self._cmd_logout()
-            elif command == "show-portfolio":
-                self._cmd_show_portfolio(args)
-            elif command == "buy":
-                self._cmd_buy(args)
-            elif command == "sell":
-                self._cmd_sell(args)
-            elif command == "get-rate":
-                self._cmd_get_rate(args)
-            elif command == "update-rates":
-                self._cmd_update_rates(args)
-            elif command == "show-rates":
-                self._cmd_show_rates(args)
-            else:
-                print(f"❌ Неизвестная команда: {command}. Введите 'help' для справки.")
+            handler(args)
         except (UserNotFoundError, AuthenticationError) as e:
             print(f"❌ Аутентификация: {e}")
         except CurrencyNotFoundError as e:
@@ -181,7 +238,7 @@ class CLI:
         except (UserNotFoundError, AuthenticationError) as e:
             print(f"❌ Ошибка входа: {e}")
 
-    def _cmd_logout(self):
+    def _cmd_logout(self, args: dict):
         self.use_cases.logout()
         print("✅ Вы вышли из системы")
 
@@ -195,20 +252,23 @@ class CLI:
         try:
             portfolio = self.use_cases.show_portfolio(base_currency)
 
-            print(f"\nПортфель пользователя '{portfolio['username']}' (база: {base_currency}):")
-            print("-" * 60)
+            out = [
+                f"\nПортфель пользователя '{portfolio['username']}' (база: {base_currency}):",
+                "-" * 60,
+            ]
 
             if not portfolio["wallets"]:
-                print("   У вас пока нет кошельков. Купите первую валюту!")
+                out.append("   У вас пока нет кошельков. Купите первую валюту!")
             else:
-                for w in portfolio["wallets"]:
-                    print(
-                        f"  {w['currency']:6} : {w['formatted_balance']:15} "
-                        f"→ {w['formatted_value']:15} {base_currency}"
-                    )
-                print("-" * 60)
-                print(f"  ИТОГО: {portfolio['formatted_total']:35} {base_currency}")
-            print()
+                out.extend(
+                    f"  {w['currency']:6} : {w['formatted_balance']:15} "
+                    f"→ {w['formatted_value']:15} {base_currency}"
+                    for w in portfolio["wallets"]
+                )
+                out.append("-" * 60)
+                out.append(f"  ИТОГО: {portfolio['formatted_total']:35} {base_currency}")
+            out.append("")
+            sys.stdout.write("\n".join(out) + "\n")
         except Exception as e:
             print(f"❌ Ошибка отображения портфеля: {e}")
 
@@ -224,17 +284,22 @@ class CLI:
             print("❌ Требуются аргументы: --currency <код> --amount <сумма>")
             return
 
-        try:
-            amount = float(amount)
-            result = self.use_cases.buy(currency, amount)
-
-            print(f"✅ Покупка выполнена: {result['amount']:.6f} {result['currency']} "
-                f"по курсу {result['rate']:.4f} {result['currency']}/USD")
-            print(f"   Стоимость покупки: {result['usd_value']:,.2f} USD")
-            print(f"   Новый баланс {result['currency']}: {result['wallet_balance']:.6f}")
-            print(f"   Оценочная стоимость: {result['usd_value']:,.2f} USD\n")
-        except ValueError:
+        if not isinstance(amount, str) or not _AMOUNT_RE.match(amount):
             print("❌ Ошибка: 'amount' должен быть числом")
+            return
+
+        try:
+            result = self.use_cases.buy(currency, float(amount))
+            code = result["currency"]
+            usd_value = result["usd_value"]
+
+            sys.stdout.write(
+                f"✅ Покупка выполнена: {result['amount']:.6f} {code} "
+                f"по курсу {result['rate']:.4f} {code}/USD\n"
+                f"   Стоимость покупки: {usd_value:,.2f} USD\n"
+                f"   Новый баланс {code}: {result['wallet_balance']:.6f}\n"
+                f"   Оценочная стоимость: {usd_value:,.2f} USD\n\n"
+            )
         except Exception as e:
             print(f"❌ Ошибка покупки: {e}")
 
@@ -250,17 +315,22 @@ class CLI:
             print("❌ Требуются аргументы: --currency <код> --amount <сумма>")
             return
 
-        try:
-            amount = float(amount)
-            result = self.use_cases.sell(currency, amount)
-
-            print(f"✅ Продажа выполнена: {result['amount']:.6f} {result['currency']} "
-                f"по курсу {result['rate']:.4f} {result['currency']}/USD")
-            print(f"   Зачислено на USD: {result['usd_revenue']:,.2f} USD")
-            print(f"   Новый баланс {result['currency']}: {result['wallet_balance']:.6f}")
-            print(f"   Выручка: {result['usd_revenue']:,.2f} USD\n")
-        except ValueError:
+        if not isinstance(amount, str) or not _AMOUNT_RE.match(amount):
             print("❌ Ошибка: 'amount' должен быть числом")
+            return
+
+        try:
+            result = self.use_cases.sell(currency, float(amount))
+            code = result["currency"]
+            usd_revenue = result["usd_revenue"]
+
+            sys.stdout.write(
+                f"✅ Продажа выполнена: {result['amount']:.6f} {code} "
+                f"по курсу {result['rate']:.4f} {code}/USD\n"
+                f"   Зачислено на USD: {usd_revenue:,.2f} USD\n"
+                f"   Новый баланс {code}: {result['wallet_balance']:.6f}\n"
+                f"   Выручка: {usd_revenue:,.2f} USD\n\n"
+            )
         except Exception as e:
             print(f"❌ Ошибка продажи: {e}")
 
@@ -275,16 +345,21 @@ class CLI:
         try:
             rate_info = self.use_cases.get_rate(from_code, to_code)
 
-            print(f"\nКурс {rate_info['from']}→{rate_info['to']}: {rate_info['formatted_rate']}")
-            print(
-                f"Обратный курс {rate_info['to']}→{rate_info['from']}: {rate_info['formatted_reverse']}"
+            sys.stdout.write(
+                f"\nКурс {rate_info['from']}→{rate_info['to']}: {rate_info['formatted_rate']}\n"
+                f"Обратный курс {rate_info['to']}→{rate_info['from']}: "
+                f"{rate_info['formatted_reverse']}\n"
+                f"Обновлено: {rate_info['updated_at']}\n\n"
             )
-            print(f"Обновлено: {rate_info['updated_at']}\n")
         except Exception as e:
             print(f"❌ Ошибка получения курса: {e}")
 
     def _cmd_update_rates(self, args: dict):
         """Команда обновления курсов валют."""
+        # Импорт откладывается до первого вызова, чтобы импорт одного interface.py
+        # не тянул parser_service и requests; main.py загружает их ради планировщика
+        from valutatrade_hub.parser_service.updater import RatesUpdater
+
         source = args.get("source")
 
         if source and source not in ("coingecko", "exchangerate"):
@@ -316,6 +391,8 @@ class CLI:
 
     def _cmd_show_rates(self, args: dict):
         """Команда показа текущих курсов."""
+        from valutatrade_hub.parser_service.storage import RatesStorage
+
         currency_filter = args.get("currency")
         top_n = args.get("top")
 
@@ -330,60 +407,55 @@ class CLI:
                 )
                 return
 
-            # Фильтрация по валюте
-            filtered_pairs = {}
+            # Фильтрация по валюте за один проход
             if currency_filter:
                 currency_filter = currency_filter.upper()
-                for pair, data in pairs.items():
-                    if pair.startswith(f"{currency_filter}_") or pair.endswith(
-                        f"_{currency_filter}"
-                    ):
-                        filtered_pairs[pair] = data
-                if not filtered_pairs:
+                pref = currency_filter + "_"
+                suf = "_" + currency_filter
+                sorted_pairs = [
+                    (pair, data)
+                    for pair, data in pairs.items()
+                    if pair.startswith(pref) or pair.endswith(suf)
+                ]
+                if not sorted_pairs:
                     print(f"ℹ️  Курс для '{currency_filter}' не найден в кеше.")
                     return
             else:
-                filtered_pairs = pairs
+                sorted_pairs = list(pairs.items())
 
             # Сортировка для --top
             if top_n:
                 try:
                     top_n = int(top_n)
-                    sorted_pairs = sorted(
-                        filtered_pairs.items(), key=lambda x: x[1]["rate"], reverse=True
-                    )[:top_n]
                 except ValueError:
                     print(f"❌ Неверное значение --top: {top_n}")
                     return
+                sorted_pairs.sort(key=lambda x: x[1]["rate"], reverse=True)
+                del sorted_pairs[top_n:]
             else:
                 # Сортировка по алфавиту
-                sorted_pairs = sorted(filtered_pairs.items(), key=lambda x: x[0])
+                sorted_pairs.sort(key=lambda x: x[0])
 
             # Формирование таблицы
-            table = PrettyTable()
-            table.field_names = ["Пара", "Курс", "Обновлено", "Источник"]
-            table.align["Пара"] = "l"
-            table.align["Курс"] = "r"
-            table.align["Обновлено"] = "l"
-            table.align["Источник"] = "l"
-
+            rows = []
             for pair, data in sorted_pairs:
                 rate = data["rate"]
-                updated_at = data["updated_at"].replace("T", " ").split(".")[0]
+                updated_at = _short_timestamp(data["updated_at"])
                 source = data["source"]
 
                 # Форматирование курса в зависимости от типа валюты
-                if pair.startswith("BTC") or pair.startswith("ETH") or pair.startswith("SOL"):
-                    rate_str = f"{rate:,.2f}"
-                else:
-                    rate_str = f"{rate:.4f}"
+                rate_format = _CRYPTO_RATE_FORMAT if pair[:3] in _CRYPTO_PREFIXES else _FIAT_RATE_FORMAT
+                rate_str = format(rate, rate_format)
 
-                table.add_row([pair, rate_str, updated_at, source])
+                rows.append((pair, rate_str, updated_at, source))
 
-            last_refresh = rates_data.get("last_refresh", "unknown").replace("T", " ").split(".")[0]
-            print(f"\nАктуальные курсы (последнее обновление: {last_refresh})")
-            print(table)
-            print()
+            table = _format_table(_RATES_TABLE_HEADER, _RATES_TABLE_ALIGN, rows)
+
+            last_refresh = _short_timestamp(rates_data.get("last_refresh", "unknown"))
+            sys.stdout.write(
+                f"\nАктуальные курсы (последнее обновление: {last_refresh})\n"
+                f"{table}\n\n"
+            )
 
         except Exception as e:
             print(f"❌ Ошибка при отображении курсов: {e}")
@@ -1,13 +1,21 @@
+import re
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
 
 from valutatrade_hub.core.exceptions import CurrencyNotFoundError
 
+_CODE_RE = re.compile(r"[A-Za-z0-9]{2,5}\Z")
+
 
 class Currency(ABC):
+    __slots__ = ("name", "code")
+
     def __init__(self, name: str, code: str):
-        if not name or not name.strip():
+        if not name or name.isspace():
             raise ValueError("Имя валюты не может быть пустым")
-        if not code or not (2 <= len(code) <= 5) or not code.isalnum():
+        if not code or not _CODE_RE.match(code):
             raise ValueError(
                 "Код валюты должен быть 2-5 символов без пробелов (только буквы/цифры)"
             )
@@ -26,6 +34,8 @@ class Currency(ABC):
 
 
 class FiatCurrency(Currency):
+    __slots__ = ("issuing_country",)
+
     def __init__(self, name: str, code: str, issuing_country: str):
         super().__init__(name, code)
         if not issuing_country or not issuing_country.strip():
@@ -37,6 +47,8 @@ class FiatCurrency(Currency):
 
 
 class CryptoCurrency(Currency):
+    __slots__ = ("algorithm", "market_cap")
+
     def __init__(self, name: str, code: str, algorithm: str, market_cap: float):
         super().__init__(name, code)
         if not algorithm or not algorithm.strip():
@@ -70,13 +82,28 @@ _CURRENCY_REGISTRY: dict[str, Currency] = {
     "XRP": CryptoCurrency("Ripple", "XRP", "RPCA", 3.2e10),
 }
 
+# Неизменяемое представление реестра: отдаётся наружу без копирования
+_CURRENCY_REGISTRY_VIEW = MappingProxyType(_CURRENCY_REGISTRY)
+
+
+@lru_cache(maxsize=64)
+def _norm(code: str) -> str:
+    """Нормализованный код валюты (верхний регистр, без пробелов)."""
+    return code.upper().strip()
+
+
+@lru_cache(maxsize=64)
+def _resolve(code: str) -> Currency:
+    normalized = _norm(code)
+    currency = _CURRENCY_REGISTRY.get(normalized)
+    if currency is None:
+        raise CurrencyNotFoundError(normalized)
+    return currency
+
 
 def get_currency(code: str) -> Currency:
-    code = code.upper().strip()
-    if code not in _CURRENCY_REGISTRY:
-        raise CurrencyNotFoundError(code)
-    return _CURRENCY_REGISTRY[code]
+    return _resolve(code)
 
 
-def get_supported_currencies() -> dict[str, Currency]:
-    return _CURRENCY_REGISTRY.copy()
+def get_supported_currencies() -> Mapping[str, Currency]:
+    return _CURRENCY_REGISTRY_VIEW
@@ -1,18 +1,41 @@
 """Модели данных приложения с приватными полями и интеграцией валют."""
 
 import hashlib
+import hmac
+import secrets
+from collections.abc import Mapping
 from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional
 
 from valutatrade_hub.infra.database import db
 
-from .currencies import Currency, get_currency
-from .exceptions import InsufficientFundsError, WalletNotFoundError
+from .currencies import Currency, _norm, get_currency, get_supported_currencies
+from .exceptions import CurrencyNotFoundError, InsufficientFundsError, WalletNotFoundError
+
+_token_urlsafe = secrets.token_urlsafe
+
+
+@lru_cache(maxsize=1024)
+def _parse_dt(value: str) -> datetime:
+    """Разбор ISO-даты; datetime неизменяем, поэтому результат можно разделять."""
+    return datetime.fromisoformat(value)
 
 
 class User:
     """Пользователь системы."""
 
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_salt",
+        "_salt_bytes",
+        "_hashed_password",
+        "_registration_date",
+        "_registration_date_iso",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -24,8 +47,10 @@ class User:
         self._user_id = user_id
         self.username = username
         self._salt = salt or self._generate_salt()
+        self._salt_bytes = self._salt.encode("utf-8")
         self._hashed_password = self._hash_password(password)
         self._registration_date = registration_date or datetime.now()
+        self._registration_date_iso: Optional[str] = None
 
     @property
     def user_id(self) -> int:
@@ -43,37 +68,49 @@ class User:
 
     @property
     def registration_date(self) -> datetime:
+        if self._registration_date is None:
+            self._registration_date = _parse_dt(self._registration_date_iso)
         return self._registration_date
 
+    def _registration_date_str(self) -> str:
+        """Дата регистрации в ISO-формате без лишнего разбора строки."""
+        if self._registration_date_iso is not None:
+            return self._registration_date_iso
+        return self._registration_date.isoformat()
+
     def _generate_salt(self) -> str:
         """Генерация уникальной соли."""
-        import secrets
-
-        return secrets.token_urlsafe(8)
+        return _token_urlsafe(8)
 
     def _hash_password(self, password: str) -> str:
         """Хеширование пароля с солью."""
         if len(password) < 4:
             raise ValueError("Пароль должен быть не короче 4 символов")
-        return hashlib.sha256((password + self._salt).encode()).hexdigest()
+        h = hashlib.sha256(password.encode("utf-8"))
+        h.update(self._salt_bytes)
+        return h.hexdigest()
 
     def verify_password(self, password: str) -> bool:
-        """Проверка пароля."""
-        return self._hash_password(password) == self._hashed_password
+        """Проверка пароля (сравнение за постоянное время)."""
+        # Короткий пароль не мог быть сохранён: отказ без хеширования
+        if not isinstance(password, str) or len(password) < 4:
+            return False
+        return hmac.compare_digest(self._hash_password(password), self._hashed_password)
 
     def change_password(self, new_password: str) -> None:
         """Изменение пароля."""
         if len(new_password) < 4:
             raise ValueError("Новый пароль должен быть не короче 4 символов")
-        self._hashed_password = self._hash_password(new_password)
         self._salt = self._generate_salt()
+        self._salt_bytes = self._salt.encode("utf-8")
+        self._hashed_password = self._hash_password(new_password)
 
     def get_user_info(self) -> dict:
         """Информация о пользователе (без пароля)."""
         return {
             "user_id": self._user_id,
             "username": self._username,
-            "registration_date": self._registration_date.isoformat(),
+            "registration_date": self._registration_date_str(),
         }
 
     def to_dict(self) -> dict:
@@ -83,7 +120,7 @@ class User:
             "username": self._username,
             "hashed_password": self._hashed_password,
             "salt": self._salt,
-            "registration_date": self._registration_date.isoformat(),
+            "registration_date": self._registration_date_str(),
         }
 
     @classmethod
@@ -94,13 +131,18 @@ class User:
         user._username = data["username"]
         user._hashed_password = data["hashed_password"]
         user._salt = data["salt"]
-        user._registration_date = datetime.fromisoformat(data["registration_date"])
+        user._salt_bytes = user._salt.encode("utf-8")
+        # Дата разбирается лениво, при первом обращении к registration_date
+        user._registration_date = None
+        user._registration_date_iso = data["registration_date"]
         return user
 
 
 class Wallet:
     """Кошелёк для одной валюты."""
 
+    __slots__ = ("_currency", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0):
         self._currency = get_currency(currency_code)  # Валидация через реестр
         self._balance = 0.0
@@ -159,68 +201,87 @@ class Wallet:
         """Десериализация."""
         return cls(currency_code=data["currency_code"], balance=data["balance"])
 
+    @classmethod
+    def _unsafe_new(cls, currency: Currency, balance: float) -> "Wallet":
+        """Создание кошелька из доверенных данных без проверок конструктора."""
+        wallet = cls.__new__(cls)
+        wallet._currency = currency
+        wallet._balance = float(balance)
+        return wallet
+
 
 class Portfolio:
     """Портфель пользователя со всеми кошельками."""
 
+    __slots__ = ("_user_id", "_wallets", "_wallets_view")
+
     def __init__(self, user_id: int, wallets: Optional[dict[str, Wallet]] = None):
         self._user_id = user_id
         self._wallets: dict[str, Wallet] = wallets or {}
+        self._wallets_view = MappingProxyType(self._wallets)
 
     @property
     def user_id(self) -> int:
         return self._user_id
 
     @property
-    def wallets(self) -> dict[str, Wallet]:
-        """Возвращает копию словаря кошельков."""
-        return self._wallets.copy()
+    def wallets(self) -> Mapping[str, Wallet]:
+        """Возвращает живое представление кошельков только для чтения."""
+        return self._wallets_view
 
     def add_currency(self, currency_code: str) -> Wallet:
         """Добавление нового кошелька для валюты."""
-        currency_code = currency_code.upper()
+        currency_code = _norm(currency_code)
         if not currency_code:
             raise ValueError("Код валюты не может быть пустым")
 
-        if currency_code in self._wallets:
-            return self._wallets[currency_code]
-
-        new_wallet = Wallet(currency_code)
-        self._wallets[currency_code] = new_wallet
-        return new_wallet
+        wallet = self._wallets.get(currency_code)
+        if wallet is None:
+            wallet = Wallet(currency_code)
+            self._wallets[currency_code] = wallet
+        return wallet
 
     def get_wallet(self, currency_code: str) -> Wallet:
         """Получение кошелька по коду валюты."""
-        currency_code = currency_code.upper()
-        if currency_code not in self._wallets:
+        currency_code = _norm(currency_code)
+        wallet = self._wallets.get(currency_code)
+        if wallet is None:
             raise WalletNotFoundError(currency_code)
-        return self._wallets[currency_code]
+        return wallet
 
     def get_total_value(self, base_currency: str = "USD", exchange_rates: Optional[dict] = None) -> float:
         if exchange_rates is None:
             exchange_rates = db.get_exchange_rates().get("pairs", {})
 
-        base_currency = base_currency.upper()
-        total = 0.0
-
-        for wallet in self._wallets.values():
-            if wallet.currency_code == base_currency:
-                total += wallet.balance
-            else:
-                pair = f"{wallet.currency_code}_{base_currency}"
-                if pair in exchange_rates and "rate" in exchange_rates[pair]:
-                    rate = exchange_rates[pair]["rate"]
-                else:
-                    # Попытка обратного курса
-                    reverse_pair = f"{base_currency}_{wallet.currency_code}"
-                    if reverse_pair in exchange_rates and "rate" in exchange_rates[reverse_pair]:
-                        rate = 1.0 / exchange_rates[reverse_pair]["rate"]
-                    else:
-                        # Пропускаем валюту без курса (не ломаем расчёт всего портфеля)
-                        continue
-                total += wallet.balance * rate
-
-        return total
+        base_currency = _norm(base_currency)
+        rate_map = self._rates_to_base(base_currency, exchange_rates)
+        # Валюты без курса пропускаются, чтобы не ломать расчёт всего портфеля
+        return sum(
+            (
+                wallet.balance * rate_map[wallet.currency_code]
+                for wallet in self._wallets.values()
+                if wallet.currency_code in rate_map
+            ),
+            0.0,
+        )
+
+    @staticmethod
+    def _rates_to_base(base_currency: str, exchange_rates: dict) -> dict[str, float]:
+        """Курсы всех доступных валют к базовой за один проход по кэшу.
+
+        Прямая пара (CODE_BASE) приоритетнее обратной (BASE_CODE).
+        """
+        rate_map = {base_currency: 1.0}
+        for pair, entry in exchange_rates.items():
+            rate = entry.get("rate") if isinstance(entry, dict) else None
+            if not rate:
+                continue
+            from_code, _, to_code = pair.partition("_")
+            if to_code == base_currency:
+                rate_map[from_code] = rate
+            elif from_code == base_currency:
+                rate_map.setdefault(to_code, 1.0 / rate)
+        return rate_map
 
     def to_dict(self) -> dict:
         """Сериализация портфеля."""
@@ -229,11 +290,24 @@ class Portfolio:
             "wallets": {code: wallet.to_dict() for code, wallet in self._wallets.items()},
         }
 
+    def wallet_to_dict(self, currency_code: str) -> dict:
+        """Сериализация одного кошелька (для записи только изменённых кошельков)."""
+        return self.get_wallet(currency_code).to_dict()
+
     @classmethod
     def from_dict(cls, data: dict) -> "Portfolio":
-        """Десериализация портфеля."""
+        """Десериализация портфеля.
+
+        Коды валют проверяются по реестру одним пересечением множеств, после чего
+        кошельки собираются без повторной нормализации и валидации каждого.
+        """
+        wallets_data = data.get("wallets", {})
+        registry = get_supported_currencies()
+        unknown = wallets_data.keys() - registry.keys()
+        if unknown:
+            raise CurrencyNotFoundError(next(iter(unknown)))
         wallets = {
-            code: Wallet.from_dict(wallet_data)
-            for code, wallet_data in data.get("wallets", {}).items()
+            code: Wallet._unsafe_new(registry[code], wallet_data["balance"])
+            for code, wallet_data in wallets_data.items()
         }
         return cls(user_id=data["user_id"], wallets=wallets)
@@ -15,7 +15,7 @@ from .exceptions import (
 from .models import Portfolio, User
 from .utils import (
     format_currency_amount,
-    get_exchange_rate,
+    get_exchange_rate_fast,
     validate_currency_code,
     validate_positive_amount,
 )
@@ -36,8 +36,8 @@ class UseCases:
         if len(password) < 4:
             raise ValidationError("password", "должен быть не короче 4 символов")
 
-        users = db.load_json("users.json", [])
-        if any(u["username"] == username for u in users):
+        _, existing = db.find_user_by_username(username)
+        if existing is not None:
             raise ValidationError("username", f"Имя пользователя '{username}' уже занято")
 
         # Создание пользователя
@@ -55,9 +55,7 @@ class UseCases:
         usd_wallet.balance = 10000.00  # ← СТАРТОВЫЙ КАПИТАЛ
 
         # Сохранение портфеля
-        portfolios = db.load_json("portfolios.json", [])
-        portfolios.append(portfolio.to_dict())
-        db.save_json("portfolios.json", portfolios)
+        db.append_portfolio_update(user_id, portfolio.to_dict()["wallets"])
 
         return user
 
@@ -65,8 +63,7 @@ class UseCases:
     def login(self, username: str, password: str) -> User:
         """Аутентификация пользователя."""
 
-        users = db.load_json("users.json", [])
-        user_data = next((u for u in users if u["username"] == username), None)
+        _, user_data = db.find_user_by_username(username)
 
         if not user_data:
             raise UserNotFoundError(username)
@@ -76,13 +73,11 @@ class UseCases:
         if not user.verify_password(password):
             raise AuthenticationError(username)
 
-        portfolios = db.load_json("portfolios.json", [])
-        portfolio_data = next((p for p in portfolios if p["user_id"] == user.user_id), None)
+        portfolio_data = db.get_portfolio(user.user_id)
 
         if not portfolio_data:
             portfolio = Portfolio(user_id=user.user_id)
-            portfolios.append(portfolio.to_dict())
-            db.save_json("portfolios.json", portfolios)
+            db.append_portfolio_update(user.user_id, {})
         else:
             portfolio = Portfolio.from_dict(portfolio_data)
 
@@ -117,8 +112,7 @@ class UseCases:
         currency_code = validate_currency_code(currency_code)
         amount = validate_positive_amount(amount, "amount")
 
-        rates = db.get_exchange_rates()
-        rate = get_exchange_rate(currency_code, "USD", rates.get("pairs", {}))
+        rate = get_exchange_rate_fast(currency_code, "USD", db.get_rate_table())
 
         portfolio = self._current_portfolio
         if portfolio is None:
@@ -127,12 +121,10 @@ class UseCases:
         wallet = portfolio.add_currency(currency_code)  # ← add_currency вместо get_wallet
         wallet.deposit(amount)
 
-        portfolios = db.load_json("portfolios.json", [])
-        for p in portfolios:
-            if p["user_id"] == user.user_id:
-                p.update(portfolio.to_dict())
-                break
-        db.save_json("portfolios.json", portfolios)
+        # В журнал пишется только изменённый кошелёк
+        db.append_portfolio_update(
+            user.user_id, {currency_code: portfolio.wallet_to_dict(currency_code)}
+        )
 
         usd_value = amount * rate
 
@@ -162,20 +154,18 @@ class UseCases:
 
         wallet.withdraw(amount)
 
-        rates = db.get_exchange_rates()
-        rate = get_exchange_rate(currency_code, "USD", rates.get("pairs", {}))
+        rate = get_exchange_rate_fast(currency_code, "USD", db.get_rate_table())
         usd_revenue = amount * rate
 
+        portfolio = self._current_portfolio
+        changed = {currency_code: portfolio.wallet_to_dict(currency_code)}
         if currency_code != "USD":
-            usd_wallet = self._current_portfolio.add_currency("USD")
+            usd_wallet = portfolio.add_currency("USD")
             usd_wallet.deposit(usd_revenue)
+            changed["USD"] = portfolio.wallet_to_dict("USD")
 
-        portfolios = db.load_json("portfolios.json", [])
-        for p in portfolios:
-            if p["user_id"] == user.user_id:
-                p.update(self._current_portfolio.to_dict())
-                break
-        db.save_json("portfolios.json", portfolios)
+        # В журнал пишутся только изменённые кошельки
+        db.append_portfolio_update(user.user_id, changed)
 
         return {
             "success": True,
@@ -194,30 +184,26 @@ class UseCases:
         if self._current_portfolio is None:
             raise RuntimeError("Портфель не загружен")
 
-        rates = db.get_exchange_rates()
+        rate_table = db.get_rate_table()
 
         wallets_data = []
         total_value = 0.0
 
+        # Коды кошельков и базовая валюта уже нормализованы; валюта без курса
+        # оценивается в 0 простым поиском по таблице, без исключений
+        rate_of = rate_table.get
         for code, wallet in self._current_portfolio.wallets.items():
-            if code == base_currency:
-                value_in_base = wallet.balance
-                rate = 1.0
-            else:
-                try:
-                    rate = get_exchange_rate(code, base_currency, rates)
-                    value_in_base = wallet.balance * rate
-                except ValueError:
-                    rate = 0.0
-                    value_in_base = 0.0
+            rate = 1.0 if code == base_currency else rate_of((code, base_currency), 0.0)
+            balance = wallet.balance
+            value_in_base = balance * rate
 
             wallets_data.append(
                 {
                     "currency": code,
-                    "balance": wallet.balance,
+                    "balance": balance,
                     "value_in_base": value_in_base,
                     "rate": rate,
-                    "formatted_balance": format_currency_amount(wallet.balance, code),
+                    "formatted_balance": format_currency_amount(balance, code),
                     "formatted_value": format_currency_amount(value_in_base, base_currency),
                 }
             )
@@ -247,24 +233,15 @@ class UseCases:
                 "updated_at": "now"
             }
 
-        rates = db.get_exchange_rates()
-        pairs = rates.get("pairs", {})
-
-        direct_pair = f"{from_code}_{to_code}"
-        reverse_pair = f"{to_code}_{from_code}"
-
-        if direct_pair in pairs:
-            rate = pairs[direct_pair]["rate"]
-        elif reverse_pair in pairs:
-            rate = 1.0 / pairs[reverse_pair]["rate"]
-        else:
+        # Таблица уже содержит прямые и обратные пары; кросс-курс — через USD
+        rate_table = db.get_rate_table()
+        rate = rate_table.get((from_code, to_code))
+        if rate is None:
             if from_code != "USD" and to_code != "USD":
-                usd_pair_from = f"{from_code}_USD"
-                usd_pair_to = f"{to_code}_USD"
-                if usd_pair_from in pairs and usd_pair_to in pairs:
-                    rate_from_usd = pairs[usd_pair_from]["rate"]
-                    rate_to_usd = pairs[usd_pair_to]["rate"]
-                    rate = rate_to_usd / rate_from_usd
+                rate_from_usd = rate_table.get((from_code, "USD"))
+                rate_usd_to = rate_table.get(("USD", to_code))
+                if rate_from_usd is not None and rate_usd_to is not None:
+                    rate = rate_from_usd * rate_usd_to
                 else:
                     raise ApiRequestError(
                         f"Курс {from_code}→{to_code} недоступен напрямую и через USD. "
@@ -284,5 +261,5 @@ class UseCases:
             "reverse_rate": reverse_rate,
             "formatted_rate": f"{rate:.8f}",
             "formatted_reverse": f"{reverse_rate:.8f}",
-            "updated_at": rates.get("last_refresh", "unknown")
+            "updated_at": db.get_exchange_rates().get("last_refresh", "unknown")
         }
@@ -1,43 +1,105 @@
 import functools
+import inspect
+import logging
 from typing import Any, Callable
 
 from .logging_config import action_logger
 
 
+def _arg_getter(params: list[str], *names: str) -> Callable[[tuple, dict], Any]:
+    """Извлекатель аргумента по имени с позицией, вычисленной заранее."""
+    for name in names:
+        if name in params:
+            idx = params.index(name)
+
+            def get(args: tuple, kwargs: dict, idx: int = idx, name: str = name) -> Any:
+                return args[idx] if idx < len(args) else kwargs.get(name)
+
+            return get
+    return _no_arg
+
+
+def _no_arg(args: tuple, kwargs: dict) -> Any:
+    return None
+
+
+def _current_user_id(args: tuple, kwargs: dict) -> Any:
+    """user_id текущего пользователя объекта, у которого вызван метод."""
+    user = getattr(args[0], "current_user", None) if args else None
+    return getattr(user, "user_id", None)
+
+
 def log_action(action_name: str, verbose: bool = False) -> Callable:
     def decorator(func: Callable) -> Callable:
+        # Позиции аргументов определяются один раз, при декорировании
+        params = list(inspect.signature(func).parameters)
+        get_currency = _arg_getter(params, "currency_code", "from_code")
+        get_amount = _arg_getter(params, "amount")
+        if "user_id" not in params and params[:1] == ["self"]:
+            get_user_id = _current_user_id
+        else:
+            get_user_id = _arg_getter(params, "user_id")
+        # Действия с username (вход) меняют сессию: до вызова и при ошибке
+        # в журнал пишется имя, под которым пытались войти, а не прежний пользователь
+        get_username = _arg_getter(params, "username")
+        changes_session = get_username is not _no_arg
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            user_id = kwargs.get("user_id") or (args[0] if len(args) > 0 else None)
-            currency_code = kwargs.get("currency_code") or kwargs.get("from_code")
-            amount = kwargs.get("amount")
+            if changes_session:
+                who, who_value = "username", get_username(args, kwargs)
+            else:
+                who, who_value = "user_id", get_user_id(args, kwargs)
+            currency_code = get_currency(args, kwargs)
+            amount = get_amount(args, kwargs)
 
+            # Сообщения форматируются логгером лениво, только если уровень включён
+            info_enabled = action_logger.isEnabledFor(logging.INFO)
             try:
-                action_logger.info(
-                    f"{action_name} START user_id={user_id}currency={currency_code} amount={amount}"
-                )
+                if info_enabled:
+                    action_logger.info(
+                        "%s START %s=%s currency=%s amount=%s",
+                        action_name,
+                        who,
+                        who_value,
+                        currency_code,
+                        amount,
+                    )
 
                 result = func(*args, **kwargs)
 
-                if verbose and hasattr(result, "wallet_state"):
-                    action_logger.info(
-                        f"{action_name} OK user_id={user_id}"
-                        f"currency={currency_code} amount={amount}"
-                        f"result={result}"
-                    )
-                else:
-                    action_logger.info(
-                        f"{action_name} OK user_id={user_id}"
-                        f"currency={currency_code} amount={amount}"
-                    )
+                user_id = get_user_id(args, kwargs)
+                if info_enabled:
+                    if verbose and hasattr(result, "wallet_state"):
+                        action_logger.info(
+                            "%s OK user_id=%s currency=%s amount=%s result=%s",
+                            action_name,
+                            user_id,
+                            currency_code,
+                            amount,
+                            result,
+                        )
+                    else:
+                        action_logger.info(
+                            "%s OK user_id=%s currency=%s amount=%s",
+                            action_name,
+                            user_id,
+                            currency_code,
+                            amount,
+                        )
 
                 return result
 
             except Exception as e:
                 action_logger.error(
-                    f"{action_name} ERROR user_id={user_id}"
-                    f"currency={currency_code} amount={amount}"
-                    f"error_type={type(e).__name__} error_message='{str(e)}'"
+                    "%s ERROR %s=%s currency=%s amount=%s error_type=%s error_message='%s'",
+                    action_name,
+                    who,
+                    who_value,
+                    currency_code,
+                    amount,
+                    type(e).__name__,
+                    e,
                 )
                 raise
 
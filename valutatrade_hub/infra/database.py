@@ -1,15 +1,54 @@
-import json
+import contextlib
+import os
 import threading
 from datetime import datetime
-from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+import orjson
 
 from .settings import settings
 
+# Формат файлов данных прежний: отступ 2 пробела, UTF-8 без экранирования
+_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Журнал изменений портфелей и порог его свёртки в portfolios.json
+_PORTFOLIO_JOURNAL = "portfolios.log"
+_COMPACT_EVERY = 100
+
+# Маркер отсутствующего или повреждённого файла (None — допустимое JSON-значение)
+_MISSING = object()
+
+
+# Ключ производной таблицы курсов в записи кэша rates.json
+_RATE_TABLE_KEY = "__rate_table__"
+
+
+def _build_rate_table(data: Any) -> dict[tuple[str, str], float]:
+    """Разворачивает пары кэша курсов ({"pairs": {...}}) в {(from, to): rate}.
+
+    Другие ключи rates.json не учитываются: без пар таблица пуста.
+    """
+    pairs = data.get("pairs") if isinstance(data, dict) else None
+    if not isinstance(pairs, dict):
+        return {}
+
+    direct: dict[tuple[str, str], float] = {}
+    for pair, entry in pairs.items():
+        rate = entry.get("rate") if isinstance(entry, dict) else None
+        from_code, sep, to_code = pair.partition("_")
+        if rate and sep:
+            direct[(from_code, to_code)] = rate
+
+    table = dict(direct)
+    for (from_code, to_code), rate in direct.items():
+        table.setdefault((to_code, from_code), 1.0 / rate)
+        table[(from_code, from_code)] = 1.0
+        table[(to_code, to_code)] = 1.0
+    return table
+
 
 class DatabaseManager:
     _instance = None
-    _lock = threading.RLock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -23,36 +62,262 @@ class DatabaseManager:
         self._initialized = True
         self._data_dir = settings.data_dir
         self._data_dir.mkdir(exist_ok=True)
+        self._data_dir_str = str(self._data_dir)
+        self._path_cache: dict[str, str] = {}
+        # Отдельная блокировка на каждый файл: работа с разными файлами не конкурирует
+        self._locks: dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        # filename -> [(mtime_ns, size), сырые байты, разобранные данные или _MISSING,
+        #              {поле: {значение: позиция в списке}}]
+        self._cache: dict[str, list] = {}
+        # Журнал портфелей: ((mtime_ns, size), {user_id: кошельки}, число записей)
+        self._journal: tuple[Optional[tuple[int, int]], dict[int, dict], int] = (None, {}, 0)
 
-    def _get_path(self, filename: str) -> Path:
-        return self._data_dir / filename
+    def _lock_for(self, filename: str) -> threading.RLock:
+        """Блокировка, защищающая файл и его запись в кэше."""
+        with self._locks_guard:
+            lock = self._locks.get(filename)
+            if lock is None:
+                lock = self._locks[filename] = threading.RLock()
+            return lock
 
-    def load_json(self, filename: str, default: Any = None) -> Any:
-        path = self._get_path(filename)
-        with self._lock:
-            if not path.exists():
-                return default if default is not None else []
+    def _get_path(self, filename: str) -> str:
+        """Путь к файлу данных; строка собирается один раз на имя файла."""
+        path = self._path_cache.get(filename)
+        if path is None:
+            path = self._path_cache[filename] = os.path.join(self._data_dir_str, filename)
+        return path
 
+    def _load_cached(self, filename: str) -> Any:
+        """Разобранное содержимое файла из кэша в памяти.
+
+        Файл перечитывается, только если изменились его mtime или размер.
+        Возвращаемый объект общий для всех вызовов и не должен изменяться;
+        если файла нет или он повреждён, возвращается _MISSING.
+        """
+        path = self._get_path(filename)
+        with self._lock_for(filename):
             try:
-                with open(path, encoding="utf-8") as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, OSError):
+                st = os.stat(path)
+            except OSError:
+                self._cache.pop(filename, None)
+                return _MISSING
+
+            stamp = (st.st_mtime_ns, st.st_size)
+            entry = self._cache.get(filename)
+            if entry is None or entry[0] != stamp:
+                try:
+                    with open(path, "rb") as f:
+                        raw = f.read()
+                except OSError:
+                    return _MISSING
+                entry = [stamp, raw, _MISSING, {}]
+                self._cache[filename] = entry
+
+            if entry[2] is _MISSING:
+                try:
+                    entry[2] = orjson.loads(entry[1])
+                except orjson.JSONDecodeError:
+                    return _MISSING
+            return entry[2]
+
+    def load_json(self, filename: str, default: Any = None) -> Any:
+        with self._lock_for(filename):
+            if self._load_cached(filename) is _MISSING:
                 return default if default is not None else []
+            # Вызывающий код может изменять результат, поэтому отдаётся копия,
+            # декодированная из закэшированных байтов (дешевле deepcopy и без I/O)
+            return orjson.loads(self._cache[filename][1])
 
     def save_json(self, filename: str, data: Any) -> None:
+        """Атомарная запись: данные пишутся во временный файл и подменяют исходный.
+
+        При сбое во время записи на диске остаётся предыдущая версия файла.
+        """
+        path = self._get_path(filename)
+        tmp_path = path + ".tmp"
+        raw = orjson.dumps(data, option=_JSON_OPTIONS)
+        with self._lock_for(filename):
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            st = os.stat(path)
+            self._cache[filename] = [(st.st_mtime_ns, st.st_size), raw, _MISSING, {}]
+
+    def _find_by(self, filename: str, field: str, value: Any) -> tuple[Optional[int], Any]:
+        """Поиск записи списка по значению поля через индекс, построенный один раз.
+
+        Индекс живёт в записи кэша и сбрасывается вместе с ней при изменении файла.
+        Возвращает (позиция, запись) или (None, None); запись только для чтения.
+        """
+        with self._lock_for(filename):
+            records = self._load_cached(filename)
+            if records is _MISSING or not isinstance(records, list):
+                return None, None
+            indexes = self._cache[filename][3]
+            index = indexes.get(field)
+            if index is None:
+                index = {record[field]: i for i, record in enumerate(records)}
+                indexes[field] = index
+            pos = index.get(value)
+            return (None, None) if pos is None else (pos, records[pos])
+
+    def find_user_by_username(self, username: str) -> tuple[Optional[int], Optional[dict]]:
+        return self._find_by("users.json", "username", username)
+
+    def _load_portfolios(self) -> dict[str, dict]:
+        """Снимок portfolios.json в виде {str(user_id): портфель}; только для чтения.
+
+        Файл прежнего формата (список портфелей) один раз переводится в словарь.
+        """
+        with self._lock_for("portfolios.json"):
+            portfolios = self._load_cached("portfolios.json")
+            if portfolios is _MISSING:
+                return {}
+            if isinstance(portfolios, list):
+                portfolios = {str(p["user_id"]): p for p in portfolios}
+                self.save_json("portfolios.json", portfolios)
+                self._cache["portfolios.json"][2] = portfolios
+            return portfolios
+
+    def find_portfolio_by_user_id(self, user_id: int) -> tuple[Optional[str], Optional[dict]]:
+        key = str(user_id)
+        portfolio = self._load_portfolios().get(key)
+        return (None, None) if portfolio is None else (key, portfolio)
+
+    def append_jsonl(self, filename: str, record: Any) -> None:
+        """Дописать запись в конец JSONL-файла (одна JSON-строка на запись) и сбросить на диск."""
         path = self._get_path(filename)
-        with self._lock, open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        data = orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+        with self._lock_for(filename), open(path, "a+b") as f:
+            # Недописанная после сбоя строка завершается переводом строки,
+            # иначе новая запись склеится с ней и будет пропущена при чтении
+            if os.fstat(f.fileno()).st_size:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load_portfolio_journal(self) -> dict[int, dict]:
+        """Состояние кошельков из журнала портфелей: {user_id: {код: кошелёк}}.
+
+        Журнал перечитывается, только если изменились его mtime или размер.
+        Записи содержат абсолютные балансы, поэтому повторное применение безопасно.
+        """
+        path = self._get_path(_PORTFOLIO_JOURNAL)
+        with self._lock_for(_PORTFOLIO_JOURNAL):
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._journal = (None, {}, 0)
+                return self._journal[1]
+
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self._journal[0] != stamp:
+                latest: dict[int, dict] = {}
+                count = 0
+                with open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            # Недописанная строка после аварийного завершения
+                            continue
+                        latest.setdefault(record["user_id"], {}).update(record["wallets"])
+                        count += 1
+                self._journal = (stamp, latest, count)
+            return self._journal[1]
+
+    def get_portfolio(self, user_id: int) -> Optional[dict]:
+        """Портфель пользователя: снимок из portfolios.json с применённым журналом."""
+        with self._lock_for(_PORTFOLIO_JOURNAL):
+            _, snapshot = self.find_portfolio_by_user_id(user_id)
+            journaled = self._load_portfolio_journal().get(user_id)
+            if journaled is None:
+                return snapshot
+            wallets = dict(snapshot["wallets"]) if snapshot else {}
+            wallets.update(journaled)
+            return {"user_id": user_id, "wallets": wallets}
+
+    def append_portfolio_update(self, user_id: int, wallets: dict[str, dict]) -> None:
+        """Записать новое состояние изменённых кошельков пользователя в журнал портфелей.
+
+        Вместо перезаписи всего portfolios.json в журнал дописывается одна строка;
+        каждые _COMPACT_EVERY записей журнал сворачивается в снимок.
+        """
+        record = {
+            "user_id": user_id,
+            "wallets": wallets,
+            "ts": datetime.now().isoformat(),
+        }
+        with self._lock_for(_PORTFOLIO_JOURNAL):
+            # Состояние журнала актуализируется до записи, после неё дополняется в памяти
+            journal = self._load_portfolio_journal()
+            count = self._journal[2] + 1
+            self.append_jsonl(_PORTFOLIO_JOURNAL, record)
+
+            st = os.stat(self._get_path(_PORTFOLIO_JOURNAL))
+            journal.setdefault(user_id, {}).update(wallets)
+            self._journal = ((st.st_mtime_ns, st.st_size), journal, count)
+
+            if count >= _COMPACT_EVERY:
+                self.compact_portfolios()
+
+    def compact_portfolios(self) -> None:
+        """Свернуть журнал портфелей в снимок portfolios.json и очистить журнал."""
+        # Порядок захвата везде один: сначала журнал, затем portfolios.json
+        with self._lock_for(_PORTFOLIO_JOURNAL):
+            journal = self._load_portfolio_journal()
+            if not journal:
+                return
+
+            self._load_portfolios()  # перевод файла прежнего формата
+            portfolios = self.load_json("portfolios.json", {})
+            for user_id, wallets in journal.items():
+                portfolio = portfolios.get(str(user_id))
+                if portfolio is None:
+                    portfolios[str(user_id)] = {"user_id": user_id, "wallets": dict(wallets)}
+                else:
+                    portfolio["wallets"].update(wallets)
+            self.save_json("portfolios.json", portfolios)
+
+            # Сбой до этой строки безопасен: журнал применится к новому снимку повторно
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._get_path(_PORTFOLIO_JOURNAL))
+            self._journal = (None, {}, 0)
 
     def get_next_user_id(self) -> int:
-        users = self.load_json("users.json", [])
-        if not users:
+        users = self._load_cached("users.json")
+        if users is _MISSING or not users:
             return 1
         return max(user["user_id"] for user in users) + 1
 
     def get_exchange_rates(self) -> dict[str, Any]:
         return self.load_json("rates.json", self._get_default_rates())
 
+    def get_rate_table(self) -> dict[tuple[str, str], float]:
+        """Плоская таблица курсов {(from, to): rate} для поиска одним обращением.
+
+        Содержит прямые пары из rates.json, обратные к ним (если прямой нет) и
+        единичные курсы валюты к самой себе. Без rates.json таблица пуста.
+        Пересчитывается только при изменении rates.json; результат общий
+        и не должен изменяться.
+        """
+        with self._lock_for("rates.json"):
+            data = self._load_cached("rates.json")
+            if data is _MISSING:
+                return {}
+            derived = self._cache["rates.json"][3]
+            table = derived.get(_RATE_TABLE_KEY)
+            if table is None:
+                table = _build_rate_table(data)
+                derived[_RATE_TABLE_KEY] = table
+            return table
+
     def update_exchange_rates(self, rates: dict[str, Any]) -> None:
         rates["last_refresh"] = datetime.now().isoformat()
         rates["source"] = "ParserServiceStub"
@@ -27,27 +27,35 @@ class SettingsLoader:
             "log_level": "INFO",
             "supported_currencies": ["USD", "EUR", "RUB", "BTC", "ETH"],
         }
+        self._cache_typed()
+
+    def _cache_typed(self) -> None:
+        """Типизированные значения часто читаемых настроек вычисляются один раз."""
+        self._data_dir_path = Path(self.get("data_dir", "data"))
+        self._rates_ttl_seconds = int(self.get("rates_ttl_seconds", 300))
+        self._default_base_currency = str(self.get("default_base_currency", "USD"))
 
     def get(self, key: str, default: Any = None) -> Any:
         return self._config.get(key, default)
 
     def set(self, key: str, value: Any) -> None:
         self._config[key] = value
+        self._cache_typed()
 
     def reload(self) -> None:
         self._load_defaults()
 
     @property
     def data_dir(self) -> Path:
-        return Path(self.get("data_dir", "data"))
+        return self._data_dir_path
 
     @property
     def rates_ttl_seconds(self) -> int:
-        return int(self.get("rates_ttl_seconds", 300))
+        return self._rates_ttl_seconds
 
     @property
     def default_base_currency(self) -> str:
-        return str(self.get("default_base_currency", "USD"))
+        return self._default_base_currency
 
 
 settings = SettingsLoader()
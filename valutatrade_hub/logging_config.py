@@ -1,11 +1,16 @@
 """Конфигурация логирования для приложения."""
 
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from typing import Optional
 
+# Фоновый поток, который пишет записи логов в файл
+_listener: Optional[QueueListener] = None
+
 
 def setup_logging(
     log_file: Optional[str] = "logs/actions.log",
@@ -15,6 +20,9 @@ def setup_logging(
     if log_file:
         Path(log_file).parent.mkdir(parents=True, exist_ok=True)
 
+    global _listener
+    shutdown_logging()
+
     root_logger = logging.getLogger()
     root_logger.handlers.clear()
     root_logger.setLevel(level)
@@ -33,6 +41,7 @@ def setup_logging(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
+    # Консоль остаётся синхронной, чтобы сообщения не перемешивались с выводом CLI
     root_logger.addHandler(console_handler)
 
     if log_file:
@@ -41,7 +50,26 @@ def setup_logging(
         )
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+
+        # Вызывающий поток только кладёт запись в очередь; запись на диск и
+        # ротация файла выполняются в фоне
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.setLevel(level)
+        root_logger.addHandler(queue_handler)
+        _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Дописать накопленные записи и остановить фоновый поток логирования."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
 
 
 action_logger = logging.getLogger("actions")
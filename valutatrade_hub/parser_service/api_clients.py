@@ -1,17 +1,112 @@
 """Клиенты для работы с внешними API получения курсов валют."""
 
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any, Optional
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 
 from valutatrade_hub.core.exceptions import ApiRequestError
 
 from .config import config
 
 
+def _create_session() -> requests.Session:
+    """HTTP-сессия с пулом соединений и повторами при временных ошибках.
+
+    Соединения (включая TLS) переиспользуются между запросами планировщика.
+    После исчерпания повторов возвращается последний ответ, чтобы ошибки
+    по-прежнему разбирались через raise_for_status.
+    """
+    retry = Retry(
+        total=config.MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip"
+    return session
+
+
+_session = _create_session()
+
+# Кэш ответов: url -> (время получения по time.monotonic, оно же в ISO-формате,
+# заголовки валидации, разобранный JSON)
+_response_cache: dict[str, tuple[float, str, dict[str, str], Any]] = {}
+_response_cache_lock = threading.Lock()
+
+
+def _get_json(
+    url: str,
+    timeout: int,
+    accept: Optional[Callable[[Any], None]] = None,
+) -> tuple[Any, Optional[str]]:
+    """GET-запрос с условной перепроверкой закэшированного ответа.
+
+    Запрос всегда уходит в сеть; при наличии кэша он условный
+    (If-None-Match / If-Modified-Since), и ответ 304 подтверждает закэшированные
+    данные без повторной загрузки. Новый ответ кэшируется, только если его принял
+    accept (при ошибочном теле он бросает исключение). При сетевой ошибке
+    возвращается последний успешный ответ не старше config.STALE_MAX_SECONDS.
+
+    Returns:
+        Пара (данные, stale_since): stale_since — время получения данных в ISO-формате,
+        если из-за сетевой ошибки возвращён устаревший ответ, иначе None
+    """
+    with _response_cache_lock:
+        cached = _response_cache.get(url)
+    now = time.monotonic()
+
+    headers = {}
+    if cached is not None:
+        validators = cached[2]
+        if "ETag" in validators:
+            headers["If-None-Match"] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    try:
+        response = _session.get(url, timeout=timeout, headers=headers)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+        if cached is not None and now - cached[0] <= config.STALE_MAX_SECONDS:
+            return cached[3], cached[1]
+        raise
+
+    if response.status_code == 304 and cached is not None:
+        data, validators = cached[3], cached[2]
+    else:
+        response.raise_for_status()
+        data = response.json()
+        if accept is not None:
+            accept(data)
+        validators = {
+            name: response.headers[name]
+            for name in ("ETag", "Last-Modified")
+            if name in response.headers
+        }
+
+    received_at = datetime.now(timezone.utc).isoformat()
+    with _response_cache_lock:
+        _response_cache[url] = (now, received_at, validators, data)
+    return data, None
+
+
 class BaseApiClient(ABC):
     """Абстрактный базовый класс для клиентов API."""
 
+    # Время получения данных, если последний fetch_rates вернул устаревший
+    # ответ из-за недоступности источника, иначе None
+    stale_since: Optional[str] = None
+
     @abstractmethod
     def fetch_rates(self) -> dict[str, float]:
         """Получение курсов валют.
@@ -38,10 +133,7 @@ class CoinGeckoClient(BaseApiClient):
         try:
             url = config.get_coingecko_url()
 
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-
-            data = response.json()
+            data, self.stale_since = _get_json(url, self.timeout)
             rates = {}
 
             # Преобразуем ответ в унифицированный формат
@@ -92,30 +184,24 @@ class ExchangeRateApiClient(BaseApiClient):
         try:
             url = config.get_exchangerate_url()
 
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
+            data, self.stale_since = _get_json(url, self.timeout, accept=self._check_response)
 
-            data = response.json()
-
-            # Проверяем успешность ответа
-            if data.get("result") != "success":
-                error_msg = data.get("error-type", "Неизвестная ошибка API")
-                raise ApiRequestError(f"Ошибка ExchangeRate-API: {error_msg}") from None
-
-            rates = {}
             base_currency = config.BASE_CURRENCY
+            conversion_rates = data.get("conversion_rates", {})
 
-            # Преобразуем курсы в унифицированный формат
-            for currency_code in config.FIAT_CURRENCIES:
-                if currency_code in data.get("conversion_rates", {}):
-                    # ExchangeRate-API возвращает: 1 USD = X единиц валюты
-                    # Нам нужно: 1 единица валюты = Y USD → Y = 1 / X
-                    inverse_rate = 1.0 / data["conversion_rates"][currency_code]
-                    pair = f"{currency_code}_{base_currency}"
-                    rates[pair] = float(inverse_rate)
+            # Преобразуем курсы в унифицированный формат.
+            # ExchangeRate-API возвращает: 1 USD = X единиц валюты
+            # Нам нужно: 1 единица валюты = Y USD → Y = 1 / X
+            rates = {
+                f"{currency_code}_{base_currency}": 1.0 / float(conversion_rates[currency_code])
+                for currency_code in config.FIAT_CURRENCIES
+                if currency_code in conversion_rates
+            }
 
             return rates
 
+        except ApiRequestError:
+            raise
         except requests.exceptions.Timeout:
             raise ApiRequestError(
                 f"Таймаут запроса к ExchangeRate-API (ожидание более {self.timeout} сек)"
@@ -136,3 +222,10 @@ class ExchangeRateApiClient(BaseApiClient):
             raise ApiRequestError(
                 f"Неизвестная ошибка при запросе к ExchangeRate-API: {str(e)}"
             ) from e
+
+    @staticmethod
+    def _check_response(data: Any) -> None:
+        """Проверка успешности ответа: тело с ошибкой не должно попасть в кэш."""
+        if data.get("result") != "success":
+            error_msg = data.get("error-type", "Неизвестная ошибка API")
+            raise ApiRequestError(f"Ошибка ExchangeRate-API: {error_msg}") from None
@@ -37,7 +37,7 @@ class ParserConfig:
 
     # ========== Пути к файлам ==========
     RATES_FILE_PATH: str = "data/rates.json"
-    HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_FILE_PATH: str = "data/exchange_rates.jsonl"
 
     # ========== Сетевые параметры ==========
     REQUEST_TIMEOUT: int = 10
@@ -45,6 +45,8 @@ class ParserConfig:
 
     # ========== Кэширование ==========
     CACHE_TTL_SECONDS: int = 300
+    # Предельный возраст ответа, который отдаётся вместо недоступного источника
+    STALE_MAX_SECONDS: int = 3600
 
     def get_coingecko_url(self) -> str:
         """Формирует полный URL для запроса к CoinGecko."""
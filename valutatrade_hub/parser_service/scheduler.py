@@ -10,8 +10,9 @@ from .updater import RatesUpdater
 class Scheduler:
     """Планировщик для периодического запуска обновления курсов."""
 
-    def __init__(self, interval_seconds: int = 300):
+    def __init__(self, interval_seconds: int = 300, daemon: bool = True):
         self.interval = interval_seconds
+        self.daemon = daemon
         self.updater = RatesUpdater()
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
@@ -24,9 +25,11 @@ class Scheduler:
             return
 
         self._stop_event.clear()
-        self._thread = threading.Thread(target=self._run_loop, daemon=True, name="RatesScheduler")
+        self._thread = threading.Thread(
+            target=self._run_loop, daemon=self.daemon, name="RatesScheduler"
+        )
         self._thread.start()
-        self.logger.info(f"Scheduler started (interval: {self.interval} seconds)")
+        self.logger.info("Scheduler started (interval: %s seconds)", self.interval)
 
     def stop(self) -> None:
         """Остановка планировщика."""
@@ -43,10 +46,12 @@ class Scheduler:
                 result = self.updater.run_update()
                 status = "success" if result["success"] else "partial success with errors"
                 self.logger.info(
-                    f"Scheduled update completed: {status}, {len(result['updated_pairs'])} pairs updated"
+                    "Scheduled update completed: %s, %d pairs updated",
+                    status,
+                    len(result["updated_pairs"]),
                 )
             except Exception as e:
-                self.logger.error(f"Scheduled update failed: {e}")
+                self.logger.error("Scheduled update failed: %s", e)
 
             # Ожидание с возможностью прерывания
             self._stop_event.wait(timeout=self.interval)
@@ -1,98 +1,295 @@
 """Хранилище для курсов валют: кэш и исторические данные."""
 
-import json
+import itertools
 import os
 import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+import orjson
 
 from .config import config
 
+# Файлы читаются программой, поэтому по умолчанию пишутся компактно;
+# форматированный вывод (отступ 2 пробела) — только по запросу
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+_JSON_OPTIONS_PRETTY = _JSON_OPTIONS | orjson.OPT_INDENT_2
+
+# Порядковый номер записи в процессе: делает id уникальным внутри одной наносекунды
+_id_counter = itertools.count()
+
+
+@lru_cache(maxsize=1024)
+def _split_pair(pair: str) -> tuple[str, str]:
+    """Разбор пары вида "BTC_USD" в коды валют; пары повторяются, результат кэшируется."""
+    if not pair or "_" not in pair:
+        raise ValueError(f"Некорректный формат пары валют: {pair}")
+
+    parts = pair.split("_")
+    from_currency = parts[0].upper()
+    to_currency = parts[1].upper() if len(parts) > 1 else config.BASE_CURRENCY
+    return from_currency, to_currency
+
+
+# Окончание каждой строки истории: метаданные, закрывающая скобка и перевод строки
+_META_TAIL = b',"meta":{"request_ms":0,"status_code":200}}\n'
+
+
+@lru_cache(maxsize=1024)
+def _pair_template(pair: str) -> tuple[bytes, bytes]:
+    """Неизменные для пары фрагменты JSON-строки записи истории.
+
+    Возвращает начало записи до номера в id ('{"id":"BTC_USD_') и поля между
+    id и курсом ('","from_currency":"BTC","to_currency":"USD","rate":').
+    Строки экранируются через orjson, порядок полей прежний.
+    """
+    from_currency, to_currency = _split_pair(pair)
+    # orjson.dumps(строка) даёт строку в кавычках; закрывающая кавычка отрезается
+    id_head = b'{"id":' + orjson.dumps(f"{from_currency}_{to_currency}_")[:-1]
+    fields = (
+        b'","from_currency":'
+        + orjson.dumps(from_currency)
+        + b',"to_currency":'
+        + orjson.dumps(to_currency)
+        + b',"rate":'
+    )
+    return id_head, fields
+
 
 class RatesStorage:
     """Управление хранением курсов валют."""
 
+    # Каталоги данных, существование которых уже проверено в этом процессе
+    _dirs_ready: set[Path] = set()
+
     def __init__(self):
         self.rates_path = Path(config.RATES_FILE_PATH)
         self.history_path = Path(config.HISTORY_FILE_PATH)
+        # Кэш содержимого rates.json и (mtime_ns, size) файла, из которого он прочитан
+        self._rates_cache: Optional[dict[str, Any]] = None
+        self._rates_stamp: Optional[tuple[int, int]] = None
+        # В кэше есть изменения, ещё не записанные в rates.json (см. flush)
+        self._dirty = False
+        # Дескриптор файла истории, открытого в durable_batch()
+        self._batch_fd: Optional[int] = None
+        self._batch_dirty = False
         self._ensure_directories()
 
     def _ensure_directories(self) -> None:
-        """Создание директорий для файлов данных при необходимости."""
-        self.rates_path.parent.mkdir(parents=True, exist_ok=True)
+        """Создание директорий для файлов данных при необходимости.
+
+        Уже подготовленные каталоги запоминаются на уровне класса, поэтому
+        повторное создание хранилища не обращается к файловой системе.
+        """
+        directory = self.rates_path.parent
+        if directory in RatesStorage._dirs_ready:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        RatesStorage._dirs_ready.add(directory)
 
     def load_current_rates(self) -> dict[str, Any]:
-        """Загрузка текущих курсов из кэша (rates.json)."""
-        if not self.rates_path.exists():
+        """Загрузка текущих курсов из кэша (rates.json).
+
+        Разобранные данные хранятся в памяти и перечитываются, только если
+        изменились mtime или размер файла и в памяти нет незаписанных изменений.
+        """
+        if self._dirty:
+            return self._rates_cache
+
+        try:
+            st = os.stat(self.rates_path)
+        except OSError:
+            self._rates_cache = None
             return {"pairs": {}, "last_refresh": datetime.now(timezone.utc).isoformat()}
 
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._rates_cache is not None and self._rates_stamp == stamp:
+            return self._rates_cache
+
         try:
-            with open(self.rates_path, encoding="utf-8") as f:
-                data = json.load(f)
-                if "pairs" not in data:
-                    data["pairs"] = {}
-                if "last_refresh" not in data:
-                    data["last_refresh"] = datetime.now(timezone.utc).isoformat()
-                return data
-        except (json.JSONDecodeError, OSError):
+            with open(self.rates_path, "rb") as f:
+                data = orjson.loads(f.read())
+        except (orjson.JSONDecodeError, OSError):
             return {"pairs": {}, "last_refresh": datetime.now(timezone.utc).isoformat()}
 
-    def save_current_rates(self, rates: dict[str, float], source: str = "ParserService") -> None:
-        """Сохранение текущих курсов в кэш (rates.json) с атомарной записью."""
+        if "pairs" not in data:
+            data["pairs"] = {}
+        if "last_refresh" not in data:
+            data["last_refresh"] = datetime.now(timezone.utc).isoformat()
+        self._rates_cache = data
+        self._rates_stamp = stamp
+        return data
+
+    def save_current_rates(
+        self, rates: dict[str, float], source: str = "ParserService", now: Optional[str] = None
+    ) -> None:
+        """Обновление текущих курсов в памяти; на диск они попадают при flush()."""
         current_data = self.load_current_rates()
-        now = datetime.now(timezone.utc).isoformat()
+        now = now or datetime.now(timezone.utc).isoformat()
 
         for pair, rate in rates.items():
             current_data["pairs"][pair] = {"rate": rate, "updated_at": now, "source": source}
 
         current_data["last_refresh"] = now
+        self._rates_cache = current_data
+        self._dirty = True
+
+    def flush(self) -> None:
+        """Атомарная запись накопленных изменений курсов в rates.json.
+
+        Если изменений нет, файл не перезаписывается. При ошибке записи
+        изменения остаются в памяти до следующего вызова.
+        """
+        if not self._dirty:
+            return
 
-        self._atomic_write(self.rates_path, current_data)
+        self._atomic_write(self.rates_path, self._rates_cache)
+        st = os.stat(self.rates_path)
+        self._rates_stamp = (st.st_mtime_ns, st.st_size)
+        self._dirty = False
 
-    def append_to_history(self, pair: str, rate: float, source: str) -> None:
+    def append_to_history(
+        self, pair: str, rate: float, source: str, now: Optional[str] = None
+    ) -> None:
         """Добавление записи в историю обменных курсов."""
-        if not pair or "_" not in pair:
-            raise ValueError(f"Некорректный формат пары валют: {pair}")
-
-        now = datetime.now(timezone.utc).isoformat()
-        parts = pair.split("_")
-        from_currency = parts[0].upper()
-        to_currency = parts[1].upper() if len(parts) > 1 else config.BASE_CURRENCY
-
-        record = {
-            "id": f"{from_currency}_{to_currency}_{now.replace(':', '').replace('-', '').replace('.', '').replace('+', '')}",
-            "from_currency": from_currency,
-            "to_currency": to_currency,
-            "rate": rate,
-            "timestamp": now,
-            "source": source,
-            "meta": {"request_ms": 0, "status_code": 200},
-        }
-
-        history = self._load_history()
-        history.append(record)
-        self._atomic_write(self.history_path, history)
-
-    def _load_history(self) -> list[dict[str, Any]]:
-        """Загрузка истории курсов."""
-        if not self.history_path.exists():
-            return []
+        self.append_many_to_history({pair: rate}, source, now)
 
+    def append_many_to_history(
+        self, pairs: dict[str, float], source: str, now: Optional[str] = None
+    ) -> None:
+        """Добавление пачки записей в историю одной операцией записи и одним fsync.
+
+        now — общая для всех записей отметка времени в ISO-формате (по умолчанию текущая).
+        """
+        if not pairs:
+            return
+
+        now = now or datetime.now(timezone.utc).isoformat()
+        time_ns = time.time_ns()
+
+        # Строки собираются из готовых фрагментов: общих для пары (_pair_template)
+        # и для всей пачки (timestamp, source, meta); сериализуется только курс.
+        # id записи: "FROM_TO_<time_ns>_<порядковый номер>"
+        tail = b',"timestamp":' + orjson.dumps(now) + b',"source":' + orjson.dumps(source)
+        tail += _META_TAIL
+        lines = []
+        for pair, rate in pairs.items():
+            id_head, fields = _pair_template(pair)
+            record_no = b"%d_%d" % (time_ns, next(_id_counter))
+            lines.append(id_head + record_no + fields + orjson.dumps(rate) + tail)
+        buf = b"".join(lines)
+
+        # Внутри durable_batch() файл уже открыт, а fsync выполняется один раз в конце
+        if self._batch_fd is not None:
+            self._write_all(self._batch_fd, buf)
+            self._batch_dirty = True
+            return
+
+        fd = self._open_history()
+        try:
+            self._write_all(fd, buf)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def durable_batch(self) -> Iterator["RatesStorage"]:
+        """Пакет записей в историю с одним fsync на выходе.
+
+        Файл истории открывается один раз на весь пакет; append_many_to_history
+        внутри блока только пишет данные, а сброс на диск выполняет flush_durable()
+        при выходе. Окно потери данных при сбое — весь пакет, а не одна запись.
+        """
+        if self._batch_fd is not None:
+            yield self
+            return
+
+        self._batch_fd = self._open_history()
+        try:
+            yield self
+        finally:
+            try:
+                self.flush_durable()
+            finally:
+                os.close(self._batch_fd)
+                self._batch_fd = None
+
+    def flush_durable(self) -> None:
+        """Сброс открытого в пакете файла истории и его каталога на диск."""
+        if self._batch_fd is None or not self._batch_dirty:
+            return
+        os.fsync(self._batch_fd)
+        self._fsync_dir(self.history_path.parent)
+        self._batch_dirty = False
+
+    def _open_history(self) -> int:
+        """Открытие файла истории на дозапись (O_APPEND).
+
+        Недописанная после сбоя последняя строка сразу завершается переводом строки,
+        иначе первая запись следующей пачки склеится с ней и будет пропущена при чтении.
+        """
+        fd = os.open(self.history_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                self._write_all(fd, b"\n")
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    @staticmethod
+    def _write_all(fd: int, buf: bytes) -> None:
+        """Запись всего буфера в дескриптор, повторяя os.write при неполной записи."""
+        view = memoryview(buf)
+        while view:
+            view = view[os.write(fd, view) :]
+
+    def iter_history(self) -> Iterator[dict[str, Any]]:
+        """Потоковое чтение истории курсов по одной записи.
+
+        В памяти одновременно находится только текущая строка файла, поэтому
+        для обхода и агрегации истории не нужно загружать её целиком.
+        """
         try:
-            with open(self.history_path, encoding="utf-8") as f:
-                data = json.load(f)
-                return data if isinstance(data, list) else []
-        except (json.JSONDecodeError, OSError):
-            return []
+            with open(self.history_path, "rb") as f:
+                for line in f:
+                    try:
+                        yield orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # Пустая или недописанная после сбоя строка
+                        continue
+        except FileNotFoundError:
+            return
 
-    def _atomic_write(self, path: Path, data: Any) -> None:
+    def _atomic_write(self, path: Path, data: Any, pretty: bool = False) -> None:
         """Атомарная запись данных в файл (через временный файл)."""
+        option = _JSON_OPTIONS_PRETTY if pretty else _JSON_OPTIONS
         with tempfile.NamedTemporaryFile(
-            mode="w", encoding="utf-8", dir=path.parent, delete=False, suffix=".tmp"
+            mode="wb", dir=path.parent, delete=False, suffix=".tmp"
         ) as tmp_file:
-            json.dump(data, tmp_file, ensure_ascii=False, indent=2)
+            tmp_file.write(orjson.dumps(data, option=option))
             tmp_file.flush()
             os.fsync(tmp_file.fileno())
 
         os.replace(tmp_file.name, path)
+        self._fsync_dir(path.parent)
+
+    @staticmethod
+    def _fsync_dir(directory: Path) -> None:
+        """Сброс на диск записи каталога, чтобы переименование пережило сбой.
+
+        На платформах без O_DIRECTORY (Windows) шаг пропускается.
+        """
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -1,6 +1,7 @@
 """Координация обновления курсов валют из внешних источников."""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any
 
@@ -25,57 +26,96 @@ class RatesUpdater:
             Словарь с результатами обновления
         """
         self.logger.info("Starting rates update...")
+        # Одна отметка времени на всё обновление: для истории, кэша и результата
+        now = datetime.now(timezone.utc).isoformat()
         results = {
             "success": True,
             "updated_pairs": {},
             "errors": [],
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now,
         }
 
-        # Обновление криптовалют
-        if source is None or source == "coingecko":
-            try:
-                self.logger.info("Fetching from CoinGecko...")
-                crypto_rates = self.coingecko_client.fetch_rates()
-                for pair, rate in crypto_rates.items():
-                    self.storage.append_to_history(pair, rate, "CoinGecko")
-                results["updated_pairs"].update(crypto_rates)
-                self.logger.info(f"OK ({len(crypto_rates)} rates)")
-            except Exception as e:
-                results["success"] = False
-                results["errors"].append(f"CoinGecko: {str(e)}")
-                self.logger.error(f"Failed to fetch from CoinGecko: {e}")
+        sources = [
+            (name, client)
+            for key, name, client in (
+                ("coingecko", "CoinGecko", self.coingecko_client),
+                ("exchangerate", "ExchangeRate-API", self.exchangerate_client),
+            )
+            if source is None or source == key
+        ]
 
-        # Обновление фиатных валют
-        if source is None or source == "exchangerate":
+        for name, _ in sources:
+            self.logger.info("Fetching from %s...", name)
+
+        # Запросы к источникам независимы, поэтому при нескольких источниках
+        # выполняются параллельно; запись в историю начинается, когда завершены все
+        if len(sources) > 1:
+            with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+                futures = [
+                    (name, client, executor.submit(client.fetch_rates))
+                    for name, client in sources
+                ]
+            fetched = [(name, client, future.result) for name, client, future in futures]
+        else:
+            fetched = [(name, client, client.fetch_rates) for name, client in sources]
+
+        # Результаты обрабатываются в исходном порядке источников
+        fetched_rates = []
+        for name, client, get_rates in fetched:
             try:
-                self.logger.info("Fetching from ExchangeRate-API...")
-                fiat_rates = self.exchangerate_client.fetch_rates()
-                for pair, rate in fiat_rates.items():
-                    self.storage.append_to_history(pair, rate, "ExchangeRate-API")
-                results["updated_pairs"].update(fiat_rates)
-                self.logger.info(f"OK ({len(fiat_rates)} rates)")
+                rates = get_rates()
             except Exception as e:
                 results["success"] = False
-                results["errors"].append(f"ExchangeRate-API: {str(e)}")
-                self.logger.error(f"Failed to fetch from ExchangeRate-API: {e}")
+                results["errors"].append(f"{name}: {str(e)}")
+                self.logger.error("Failed to fetch from %s: %s", name, e)
+                continue
+            if client.stale_since is not None:
+                # Источник недоступен, и клиент вернул ранее полученный ответ: эти курсы
+                # уже записаны при получении и не должны получить отметку текущего времени
+                results["success"] = False
+                results["errors"].append(
+                    f"{name}: источник недоступен, последние данные получены {client.stale_since}"
+                )
+                self.logger.warning(
+                    "%s unavailable, cached rates from %s skipped", name, client.stale_since
+                )
+                continue
+            fetched_rates.append((name, rates))
+            results["updated_pairs"].update(rates)
+            self.logger.info("OK (%d rates)", len(rates))
+
+        source_name = "ParserService"
+        if len(results["errors"]) == 1:
+            source_name = (
+                "CoinGecko" if "ExchangeRate-API" in results["errors"][0] else "ExchangeRate-API"
+            )
+        elif len(results["errors"]) == 0:
+            source_name = "CoinGecko+ExchangeRate-API"
+
+        # История всех источников сбрасывается на диск одним fsync;
+        # ошибка записи истории не мешает обновить кэш текущих курсов
+        try:
+            with self.storage.durable_batch():
+                for name, rates in fetched_rates:
+                    self.storage.append_many_to_history(rates, name, now)
+        except OSError as e:
+            results["success"] = False
+            results["errors"].append(f"history: {str(e)}")
+            self.logger.error("Failed to write history to %s: %s", self.storage.history_path, e)
 
         # Сохранение в кэш
         if results["updated_pairs"]:
-            source_name = "ParserService"
-            if len(results["errors"]) == 1:
-                source_name = (
-                    "CoinGecko"
-                    if "ExchangeRate-API" in results["errors"][0]
-                    else "ExchangeRate-API"
+            self.storage.save_current_rates(results["updated_pairs"], source_name, now)
+            try:
+                self.storage.flush()
+            except OSError as e:
+                results["success"] = False
+                results["errors"].append(f"cache: {str(e)}")
+                self.logger.error("Failed to write rates to %s: %s", self.storage.rates_path, e)
+            else:
+                self.logger.info(
+                    "Writing %d rates to %s", len(results["updated_pairs"]), self.storage.rates_path
                 )
-            elif len(results["errors"]) == 0:
-                source_name = "CoinGecko+ExchangeRate-API"
-
-            self.storage.save_current_rates(results["updated_pairs"], source_name)
-            self.logger.info(
-                f"Writing {len(results['updated_pairs'])} rates to {self.storage.rates_path}"
-            )
 
         self.logger.info("Update completed")
         return results